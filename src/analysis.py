@@ -1,18 +1,34 @@
 from __future__ import annotations
 
+import bisect
+import heapq
 import logging
 import re
 from dataclasses import dataclass
-from typing import List, Optional, Sequence, Tuple
+from itertools import accumulate
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
 
 from pydantic import BaseModel, ConfigDict, Field
 from enum import Enum
 
-from ingestion import ZoningMetadata, ZoningPlanFile, ZoningDocument
-from parsing import LegalChunk, MarkdownParser, estimate_tokens
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+from ingestion import ZoningPlanFile, ZoningDocument
+from parsing import ArtifactCache, LegalChunk, MarkdownParser, estimate_tokens_batch
 
 LOGGER = logging.getLogger(__name__)
 
+KeywordEntries = Tuple[Tuple[str, int], ...]
+
+_TRAIL_NUM_RE = re.compile(r"\s+\d+$")
+
+_PERMIT_FREE_RE = re.compile(
+    r"(?i)\b(vergunningsvrij|vergunningvrij|zonder omgevingsvergunning|geen omgevingsvergunning|niet vergunningplichtig|uitzondering op de vergunningplicht|is niet van toepassing)\b"
+)
+
 
 class PermitStatus(str, Enum):
     YES = "Yes"
@@ -44,7 +60,7 @@ class ZoningAssessment(BaseModel):
     risk_flags: List[str] = Field(default_factory=list)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ResidentPlan:
     structure: str = "bijbehorend bouwwerk (outbuilding)"
     area_m2: float = 20.0
@@ -60,7 +76,7 @@ class ResidentPlan:
         )
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ContextBuilderConfig:
     model_for_token_estimation: str = "gpt-4o"
     max_context_tokens: int = 10_000
@@ -71,8 +87,45 @@ class ContextBuilderConfig:
     force_living_space_chunks: bool = True
 
 
+class _KeywordMatcher:
+    """
+    Multi-keyword matcher reporting, per text, the distinct keywords it contains.
+
+    Each keyword carries its (category, weight) entries. With pyahocorasick, all texts
+    are scanned in one linear Aho–Corasick pass; without it, each text falls back to
+    one substring test per keyword.
+    """
+
+    def __init__(self, table: Dict[str, KeywordEntries]) -> None:
+        self._table = table
+        self._automaton = None
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for word, entries in table.items():
+                self._automaton.add_word(word, (word, entries))
+            self._automaton.make_automaton()
+
+    def distinct_hits(self, texts: Sequence[str]) -> List[Dict[str, KeywordEntries]]:
+        if self._automaton is None:
+            return [{w: e for w, e in self._table.items() if w in t} for t in texts]
+
+        hits: List[Dict[str, KeywordEntries]] = [{} for _ in texts]
+        if not texts:
+            return hits
+
+        # Texts are joined with NUL separators (no keyword contains one, so no match spans
+        # two texts); ends[i] is the offset just past text i's separator.
+        ends = list(accumulate(len(t) + 1 for t in texts))
+        joined = "\0".join(texts)
+
+        for end, (word, entries) in self._automaton.iter(joined):
+            hits[bisect.bisect_right(ends, end)][word] = entries
+
+        return hits
+
+
 class ContextBuilder:
-    PERMIT_FREE_SIGNALS: Tuple[str, ...] = (
+    PERMIT_FREE_SIGNALS: FrozenSet[str] = frozenset((
         "vergunningsvrij",
         "vergunningvrij",
         "zonder omgevingsvergunning",
@@ -80,18 +133,18 @@ class ContextBuilder:
         "niet vergunningplichtig",
         "uitzondering op de vergunningplicht",
         "is niet van toepassing",
-    )
+    ))
 
-    CONSTRUCTION_GATE: Tuple[str, ...] = (
+    CONSTRUCTION_GATE: FrozenSet[str] = frozenset((
         "bouw", "bouwen", "bouwwerk", "bouwwerken",
         "bijbehorend", "bijgebouw", "erf", "achtererf",
         "aanbouw", "uitbouw", "erker", "berging", "schuur", "tuinhuis", "garage", "carport",
         "dakterras", "balkon",
         "omgevingsplanactiviteit", "bouwactiviteit",
         "vergunningplicht", "omgevingsvergunning",
-    )
+    ))
 
-    PLAN_TERMS: Tuple[str, ...] = (
+    PLAN_TERMS: FrozenSet[str] = frozenset((
         "bijbehorend bouwwerk",
         "bijgebouw",
         "erfbebouwing",
@@ -100,20 +153,52 @@ class ContextBuilder:
         "bouwhoogte",
         "goothoogte",
         "m2",
-    )
+    ))
 
-    LIVING_SPACE_TERMS: Tuple[str, ...] = (
+    LIVING_SPACE_TERMS: FrozenSet[str] = frozenset((
         "verblijfsgebied",
         "verblijfsruimte",
         "woonfunctie",
         "bewoning",
         "wonen",
         "permanente bewoning",
-    )
+    ))
+
+    LIVING_PLAN_MARKERS: Tuple[str, ...] = ("verblijfsgebied", "living space", "woonfunctie")
 
-    def __init__(self, parser: Optional[MarkdownParser] = None, cfg: Optional[ContextBuilderConfig] = None) -> None:
+    GATE_CATEGORIES: FrozenSet[str] = frozenset(("permit_free", "zoning", "construction"))
+
+    def __init__(
+        self,
+        parser: Optional[MarkdownParser] = None,
+        cfg: Optional[ContextBuilderConfig] = None,
+        cache: Optional[ArtifactCache] = None,
+    ) -> None:
         self.parser = parser or MarkdownParser()
         self.cfg = cfg or ContextBuilderConfig()
+        self.cache = cache
+        self._keywords = self._keyword_table()
+
+    def _keyword_table(self) -> Dict[str, KeywordEntries]:
+        table: Dict[str, KeywordEntries] = {}
+
+        def add(words: Iterable[str], category: str, weight: int) -> None:
+            for w in words:
+                table[w] = table.get(w, ()) + ((category, weight),)
+
+        add(self.PERMIT_FREE_SIGNALS, "permit_free", 50)
+        add(self.PLAN_TERMS, "plan", 20)
+        add(self.LIVING_SPACE_TERMS, "living", 25)
+        add(self.CONSTRUCTION_GATE, "construction", 0)
+        add(("uitzondering", "vergunningplicht"), "bonus", 8)
+        return table
+
+    def _build_matcher(self, zoning_terms: Sequence[str]) -> _KeywordMatcher:
+        table = dict(self._keywords)
+        for t in zoning_terms:
+            if t:
+                table[t] = table.get(t, ()) + (("zoning", 10),)
+        return _KeywordMatcher(table)
 
     @staticmethod
     def _normalize_designation_terms(bestemmingsvlakken: Sequence[str]) -> List[str]:
@@ -129,67 +214,50 @@ class ContextBuilder:
                 if parts:
                     terms.append(parts[-1]) 
 
-            s2 = re.sub(r"\s+\d+$", "", s).strip()
+            s2 = _TRAIL_NUM_RE.sub("", s).strip()
             if s2 and s2 != s:
                 terms.append(s2)
 
-        seen = set()
-        out: List[str] = []
-        for t in terms:
-            if t not in seen:
-                out.append(t)
-                seen.add(t)
-        return out
-
-    def _chunk_score(self, chunk: LegalChunk, zoning_terms: Sequence[str], plan: ResidentPlan) -> int:
-        text = f"{chunk.heading}\n{chunk.text}".lower()
-        score = 0
-
-        for sig in self.PERMIT_FREE_SIGNALS:
-            if sig in text:
-                score += 50
-
-        for t in self.PLAN_TERMS:
-            if t in text:
-                score += 20
-
-        for t in zoning_terms:
-            if t and t in text:
-                score += 10
-
-        if any(term in plan.intended_use.lower() for term in ("verblijfsgebied", "living space", "woonfunctie")):
-            for t in self.LIVING_SPACE_TERMS:
-                if t in text:
-                    score += 25
-
-        if "uitzondering" in text:
-            score += 8
-        if "vergunningplicht" in text:
-            score += 8
+        return list(dict.fromkeys(terms))
 
-        return score
+    def _plan_is_living(self, plan: ResidentPlan) -> bool:
+        intended_use = plan.intended_use.lower()
+        return any(term in intended_use for term in self.LIVING_PLAN_MARKERS)
 
-    def _passes_gate(self, chunk: LegalChunk, zoning_terms: Sequence[str], plan: ResidentPlan) -> bool:
-        text = f"{chunk.heading}\n{chunk.text}".lower()
+    def _chunk_score(self, hits: Dict[str, KeywordEntries], plan_is_living: bool) -> int:
+        """
+        Relevance score of a chunk from its distinct keyword hits.
 
-        if any(sig in text for sig in self.PERMIT_FREE_SIGNALS):
-            return True
-
-        if any(z in text for z in zoning_terms):
-            return True
+        Returns 0 unless the chunk passes the gate: a permit-free signal, zoning term,
+        construction term or (for living-space plans) living-space term must be present.
+        """
+        score = 0
+        passes_gate = False
 
-        if any(k in text for k in self.CONSTRUCTION_GATE):
-            return True
+        # Each distinct keyword counts once, however often it occurs.
+        for entries in hits.values():
+            for category, weight in entries:
+                if category == "living" and not plan_is_living:
+                    continue
+                score += weight
+                if category in self.GATE_CATEGORIES or category == "living":
+                    passes_gate = True
 
-        if any(term in plan.intended_use.lower() for term in ("verblijfsgebied", "living space", "woonfunctie")):
-            if any(t in text for t in self.LIVING_SPACE_TERMS):
-                return True
+        return score if passes_gate else 0
 
-        return False
+    @staticmethod
+    def _format_header(c: LegalChunk) -> str:
+        return (
+            f"[SOURCE] {c.doc_title} | doc_id={c.doc_id} | type={c.document_type} | date={c.established_date}\n"
+            f"[ARTICLE] {c.article_id or 'N/A'}\n"
+            f"[HEADING] {c.heading}\n"
+        )
 
     def build_context(self, zoning_plan: ZoningPlanFile, documents: Sequence[ZoningDocument], plan: ResidentPlan) -> Tuple[str, List[LegalChunk]]:
         cfg = self.cfg
         zoning_terms = self._normalize_designation_terms(zoning_plan.zoning_metadata.bestemmingsvlakken)
+        matcher = self._build_matcher(zoning_terms)
+        plan_is_living = self._plan_is_living(plan)
 
         all_chunks: List[LegalChunk] = []
         for doc in documents:
@@ -203,21 +271,20 @@ class ContextBuilder:
                     forced.append(c)
                     break
 
-        if cfg.force_living_space_chunks and any(term in plan.intended_use.lower() for term in ("verblijfsgebied", "living space", "woonfunctie")):
+        if cfg.force_living_space_chunks and plan_is_living:
             for c in all_chunks:
-                text = f"{c.heading}\n{c.text}".lower()
-                if "verblijfsgebied" in text or "woonfunctie" in text:
+                if "verblijfsgebied" in c.lower_blob or "woonfunctie" in c.lower_blob:
                     forced.append(c)
 
-        scored: List[Tuple[int, LegalChunk]] = []
-        for c in all_chunks:
-            if not self._passes_gate(c, zoning_terms, plan):
-                continue
-            score = self._chunk_score(c, zoning_terms, plan)
+        # Min-heap on (-score, position): pops best-first, ties keep document order.
+        scored: List[Tuple[int, int, LegalChunk]] = []
+        chunk_hits = matcher.distinct_hits([c.lower_blob for c in all_chunks])
+        for i, (c, hits) in enumerate(zip(all_chunks, chunk_hits)):
+            score = self._chunk_score(hits, plan_is_living)
             if score > 0:
-                scored.append((score, c))
+                scored.append((-score, i, c))
 
-        scored.sort(key=lambda x: x[0], reverse=True)
+        heapq.heapify(scored)
 
         selected: List[LegalChunk] = []
         seen_ids = set()
@@ -232,26 +299,19 @@ class ContextBuilder:
         for c in forced:
             add_chunk(c)
 
-        for _, c in scored:
-            if len(selected) >= cfg.max_chunks:
-                break
+        while scored and len(selected) < cfg.max_chunks:
+            _, _, c = heapq.heappop(scored)
             add_chunk(c)
 
-        context_parts: List[str] = []
-        tokens_used = 0
+        # Exact per-block costs (header + body, tokenized together in one batch call), so the
+        # assembled context never exceeds the budget.
+        blocks = [f"{self._format_header(c)}{c.text}\n" for c in selected]
+        block_tokens = estimate_tokens_batch(blocks, model=cfg.model_for_token_estimation, cache=self.cache)
+        cumulative = list(accumulate(block_tokens))
+        n_fit = bisect.bisect_right(cumulative, cfg.max_context_tokens)
 
-        for c in selected:
-            block = (
-                f"[SOURCE] {c.doc_title} | doc_id={c.doc_id} | type={c.document_type} | date={c.established_date}\n"
-                f"[ARTICLE] {c.article_id or 'N/A'}\n"
-                f"[HEADING] {c.heading}\n"
-                f"{c.text}\n"
-            )
-            block_tokens = estimate_tokens(block, model=cfg.model_for_token_estimation)
-            if tokens_used + block_tokens > cfg.max_context_tokens:
-                break
-            context_parts.append(block)
-            tokens_used += block_tokens
+        context_parts = blocks[:n_fit]
+        tokens_used = cumulative[n_fit - 1] if n_fit else 0
 
         context = "\n\n".join(context_parts).strip()
 
@@ -266,12 +326,31 @@ class ContextBuilder:
 
 
 class ZoningAnalyzer:
+    SYSTEM_PROMPT: str = (
+        "You are a Dutch zoning & permitting expert (Ruimtelijke Ordening / Omgevingswet).\n"
+        "Your task: Decide if the resident's plan is PERMIT-FREE (vergunningsvrij) at the given address.\n\n"
+        "HARD RULES (from assignment):\n"
+        "1) Use ONLY the provided 'Relevant Excerpts'.\n"
+        "2) Answer 'Yes' ONLY if the excerpts explicitly indicate permit-free, e.g. 'vergunningsvrij', "
+        "'zonder omgevingsvergunning', 'niet vergunningplichtig', or 'is niet van toepassing'.\n"
+        "3) If a rule allows building/usage but does NOT explicitly say permit-free, answer 'No' (permit required).\n\n"
+        "TRAP / HIGH-RISK NUANCE:\n"
+        "- The plan is an outbuilding (bijbehorend bouwwerk) used as Living Space (verblijfsgebied / woonfunctie).\n"
+        "- Outbuildings are often only permit-free for storage/hobby; living space frequently triggers permits.\n"
+        "- Therefore: you MUST explicitly check whether the permit-free clause (if any) allows a verblijfsgebied/woonfunctie "
+        "inside the outbuilding. If unclear, answer 'No' or 'Conditional'.\n\n"
+        "OUTPUT REQUIREMENTS:\n"
+        "- Provide a decision (Yes/No/Conditional).\n"
+        "- Provide a concise summary.\n"
+        "- Provide cited_evidence with short excerpts (<= ~30 words each).\n"
+        "- If Conditional: list missing_information.\n"
+    )
+
     def __init__(self, api_key: str, model: str = "gpt-4o", temperature: float = 0.0) -> None:
         self.api_key = api_key
         self.model = model
         self.temperature = temperature
 
-    def analyze(self, *, plan: ResidentPlan, zoning_context: str, metadata: ZoningMetadata, address: str) -> ZoningAssessment:
         try:
             from langchain_openai import ChatOpenAI
             from langchain_core.prompts import ChatPromptTemplate
@@ -280,35 +359,17 @@ class ZoningAnalyzer:
                 "Missing langchain dependencies. Run: pip install -r requirements.txt"
             ) from e
 
+        # Built once and reused for every address: the structured-output schema and
+        # the underlying HTTP client (keep-alive connections) are shared across calls.
         llm = ChatOpenAI(
             model=self.model,
             temperature=self.temperature,
             api_key=self.api_key,
         )
 
-        system = (
-            "You are a Dutch zoning & permitting expert (Ruimtelijke Ordening / Omgevingswet).\n"
-            "Your task: Decide if the resident's plan is PERMIT-FREE (vergunningsvrij) at the given address.\n\n"
-            "HARD RULES (from assignment):\n"
-            "1) Use ONLY the provided 'Relevant Excerpts'.\n"
-            "2) Answer 'Yes' ONLY if the excerpts explicitly indicate permit-free, e.g. 'vergunningsvrij', "
-            "'zonder omgevingsvergunning', 'niet vergunningplichtig', or 'is niet van toepassing'.\n"
-            "3) If a rule allows building/usage but does NOT explicitly say permit-free, answer 'No' (permit required).\n\n"
-            "TRAP / HIGH-RISK NUANCE:\n"
-            "- The plan is an outbuilding (bijbehorend bouwwerk) used as Living Space (verblijfsgebied / woonfunctie).\n"
-            "- Outbuildings are often only permit-free for storage/hobby; living space frequently triggers permits.\n"
-            "- Therefore: you MUST explicitly check whether the permit-free clause (if any) allows a verblijfsgebied/woonfunctie "
-            "inside the outbuilding. If unclear, answer 'No' or 'Conditional'.\n\n"
-            "OUTPUT REQUIREMENTS:\n"
-            "- Provide a decision (Yes/No/Conditional).\n"
-            "- Provide a concise summary.\n"
-            "- Provide cited_evidence with short excerpts (<= ~30 words each).\n"
-            "- If Conditional: list missing_information.\n"
-        )
-
         prompt = ChatPromptTemplate.from_messages(
             [
-                ("system", system),
+                ("system", self.SYSTEM_PROMPT),
                 ("user",
                  "Address:\n{address}\n\n"
                  "Plot metadata (bestemmingsvlakken & maatvoeringen):\n{metadata}\n\n"
@@ -317,13 +378,13 @@ class ZoningAnalyzer:
             ]
         )
 
-        structured_llm = llm.with_structured_output(ZoningAssessment)
-        chain = prompt | structured_llm
+        self._chain = prompt | llm.with_structured_output(ZoningAssessment)
 
-        result: ZoningAssessment = chain.invoke(
+    def analyze(self, *, plan: ResidentPlan, zoning_context: str, metadata_dump: Dict[str, Any], address: str) -> ZoningAssessment:
+        result: ZoningAssessment = self._chain.invoke(
             {
                 "address": address,
-                "metadata": metadata.model_dump(),
+                "metadata": metadata_dump,
                 "plan": plan.as_text(),
                 "context": zoning_context,
             }
@@ -333,20 +394,15 @@ class ZoningAnalyzer:
 
     @staticmethod
     def _post_validate(*, result: ZoningAssessment, plan: ResidentPlan, zoning_context: str) -> ZoningAssessment:
-        context_lower = zoning_context.lower()
-
-        permit_free_re = re.compile(
-            r"(?i)\b(vergunningsvrij|vergunningvrij|zonder omgevingsvergunning|geen omgevingsvergunning|niet vergunningplichtig|uitzondering op de vergunningplicht|is niet van toepassing)\b"
-        )
-
-        if result.permit_free == PermitStatus.YES and not permit_free_re.search(context_lower):
+        if result.permit_free == PermitStatus.YES and not _PERMIT_FREE_RE.search(zoning_context):
             LOGGER.warning("Downgrading YES -> CONDITIONAL because no explicit permit-free signal found in context.")
             result.permit_free = PermitStatus.CONDITIONAL
             result.missing_information.append(
                 "No explicit 'permit-free' language found in the provided excerpts; verify complete applicable articles."
             )
 
-        if "verblijfsgebied" in plan.intended_use.lower() or "living space" in plan.intended_use.lower():
+        intended_use = plan.intended_use.lower()
+        if "verblijfsgebied" in intended_use or "living space" in intended_use:
             if "Living space in outbuilding is high-risk" not in result.risk_flags:
                 result.risk_flags.append("Living space in outbuilding is high-risk")
 
@@ -7,7 +7,12 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
-from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, ValidationError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 LOGGER = logging.getLogger(__name__)
 
@@ -45,11 +50,17 @@ class ZoningDocument(BaseModel):
     document_type_description: Optional[str] = None
     established_date: Optional[str] = None
 
-    def established_datetime(self) -> Optional[datetime]:
-        if not self.established_date:
+    _established_dt: Optional[datetime] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._established_dt = self._parse_established_date(self.established_date)
+
+    @staticmethod
+    def _parse_established_date(value: Optional[str]) -> Optional[datetime]:
+        if not value:
             return None
 
-        raw = self.established_date.strip()
+        raw = value.strip()
         try:
             return datetime.fromisoformat(raw.replace("Z", "+00:00"))
         except ValueError:
@@ -60,6 +71,9 @@ class ZoningDocument(BaseModel):
         except ValueError:
             return None
 
+    def established_datetime(self) -> Optional[datetime]:
+        return self._established_dt
+
 class ZoningPlanFile(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
@@ -68,7 +82,7 @@ class ZoningPlanFile(BaseModel):
     zoning_metadata: ZoningMetadata
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class DocumentFilterConfig:
     allowed_document_types: Tuple[str, ...] = ("Bestemmingsplan", "Omgevingsplan")
     exclude_title_contains: Tuple[str, ...] = ("parapluplan",)
@@ -89,8 +103,12 @@ class ZoningDataLoader:
         if not path.exists():
             raise FileNotFoundError(f"Zoning file not found: {path}")
 
-        with path.open("r", encoding="utf-8") as f:
-            raw: Dict[str, Any] = json.load(f)
+        raw: Dict[str, Any]
+        if orjson is not None:
+            raw = orjson.loads(path.read_bytes())
+        else:
+            with path.open("r", encoding="utf-8") as f:
+                raw = json.load(f)
 
         try:
             return ZoningPlanFile.model_validate(raw)
@@ -4,12 +4,13 @@ import argparse
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 from dotenv import load_dotenv
 
 from ingestion import ZoningDataLoader
-from parsing import MarkdownParser
+from parsing import ArtifactCache, MarkdownParser
 from analysis import ContextBuilder, ContextBuilderConfig, ResidentPlan, ZoningAnalyzer
 
 
@@ -25,6 +26,12 @@ def build_arg_parser() -> argparse.ArgumentParser:
     p.add_argument("--model", default="gpt-4o", help="OpenAI model name (via LangChain ChatOpenAI).")
     p.add_argument("--max-context-tokens", type=int, default=10_000, help="Token budget for retrieved context.")
     p.add_argument("--max-chunks", type=int, default=40, help="Maximum chunks to include in context.")
+    p.add_argument("--concurrency", type=int, default=4, help="Number of addresses analyzed in parallel.")
+    p.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory for an on-disk cache of parsed chunks and token counts (e.g. ~/.cache/struck).",
+    )
     p.add_argument("--verbose", action="store_true", help="Enable debug logs.")
     p.add_argument("--output-json", action="store_true", help="Print raw JSON output per address.")
     return p
@@ -40,10 +47,12 @@ def main() -> None:
         raise ValueError("OPENAI_API_KEY not set.")
 
     loader = ZoningDataLoader(args.data_dir)
-    parser = MarkdownParser()
+    cache = ArtifactCache(args.cache_dir) if args.cache_dir else None
+    parser = MarkdownParser(cache=cache)
 
     context_builder = ContextBuilder(
         parser=parser,
+        cache=cache,
         cfg=ContextBuilderConfig(
             max_context_tokens=args.max_context_tokens,
             max_chunks=args.max_chunks,
@@ -68,58 +77,72 @@ def main() -> None:
 
     print(f"Starting zoning analysis for {len(filenames)} addresses...\n")
 
-    for filename in filenames:
-        zoning_file = loader.load_file(filename)
-        address = zoning_file.address.display_address
-        print(f"--- Processing: {filename} ---")
-        print(f"Address: {address}")
-        print(f"Bestemmingsvlakken: {zoning_file.zoning_metadata.bestemmingsvlakken}")
-
-        valid_docs = loader.filter_documents(zoning_file.zoning_documents)
-        print(f"Documents considered: {len(valid_docs)} (after Parapluplan/type filtering)")
+    def process_one(filename: str) -> List[str]:
+        out: List[str] = [f"--- Processing: {filename} ---"]
 
-        zoning_context, selected_chunks = context_builder.build_context(
-            zoning_plan=zoning_file,
-            documents=valid_docs,
-            plan=plan,
-        )
+        # Report per-file failures inline, like LLM errors, so the other addresses still print.
+        try:
+            zoning_file = loader.load_file(filename)
+            address = zoning_file.address.display_address
+            metadata_dump = zoning_file.zoning_metadata.model_dump(mode="python", exclude_none=True)
+            out.append(f"Address: {address}")
+            out.append(f"Bestemmingsvlakken: {zoning_file.zoning_metadata.bestemmingsvlakken}")
+
+            valid_docs = loader.filter_documents(zoning_file.zoning_documents)
+            out.append(f"Documents considered: {len(valid_docs)} (after Parapluplan/type filtering)")
+
+            zoning_context, selected_chunks = context_builder.build_context(
+                zoning_plan=zoning_file,
+                documents=valid_docs,
+                plan=plan,
+            )
+        except Exception as e:
+            out.append(f"ERROR processing {filename}: {e}")
+            out.append("-" * 80 + "\n")
+            return out
 
-        print(f"Retrieved context size: {len(zoning_context)} chars")
-        print("Analyzing with LLM...")
+        out.append(f"Retrieved context size: {len(zoning_context)} chars")
+        out.append("Analyzing with LLM...")
 
         try:
             assessment = analyzer.analyze(
                 plan=plan,
                 zoning_context=zoning_context,
-                metadata=zoning_file.zoning_metadata,
+                metadata_dump=metadata_dump,
                 address=address,
             )
 
             if args.output_json:
-                print(json.dumps(assessment.model_dump(), ensure_ascii=False, indent=2))
+                out.append(json.dumps(assessment.model_dump(), ensure_ascii=False, indent=2))
             else:
-                print(f"Decision (permit-free): {assessment.permit_free.value}")
-                print(f"Summary: {assessment.summary}")
+                out.append(f"Decision (permit-free): {assessment.permit_free.value}")
+                out.append(f"Summary: {assessment.summary}")
                 if assessment.suggested_changes:
-                    print(f"Suggested changes: {assessment.suggested_changes}")
+                    out.append(f"Suggested changes: {assessment.suggested_changes}")
                 if assessment.missing_information:
-                    print("Missing information:")
+                    out.append("Missing information:")
                     for mi in assessment.missing_information:
-                        print(f" - {mi}")
+                        out.append(f" - {mi}")
                 if assessment.risk_flags:
-                    print("Risk flags:")
+                    out.append("Risk flags:")
                     for rf in assessment.risk_flags:
-                        print(f" - {rf}")
+                        out.append(f" - {rf}")
 
-                print("Evidence:")
+                out.append("Evidence:")
                 for ev in assessment.cited_evidence:
                     art = ev.article or "N/A"
-                    print(f" - {ev.source_document} | Artikel {art}: {ev.excerpt} ({ev.relevance})")
+                    out.append(f" - {ev.source_document} | Artikel {art}: {ev.excerpt} ({ev.relevance})")
 
         except Exception as e:
-            print(f"ERROR analyzing {filename}: {e}")
+            out.append(f"ERROR analyzing {filename}: {e}")
+
+        out.append("-" * 80 + "\n")
+        return out
 
-        print("-" * 80 + "\n")
+    # Each address is dominated by LLM network latency; overlap them and print in input order.
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as ex:
+        for lines in ex.map(process_one, filenames):
+            print("\n".join(lines))
 
 
 if __name__ == "__main__":
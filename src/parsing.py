@@ -1,16 +1,21 @@
 from __future__ import annotations
 
+import functools
+import hashlib
 import logging
+import os
 import re
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, field
+from itertools import pairwise
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from ingestion import ZoningDocument
 
 LOGGER = logging.getLogger(__name__)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class LegalChunk:
     doc_id: str
     doc_title: str
@@ -21,39 +26,117 @@ class LegalChunk:
     heading: str                    
     text: str                       
 
+    # Lowercased "heading\ntext", computed once for keyword matching.
+    lower_blob: str = field(init=False, repr=False, compare=False)
 
-def _normalize_text(text: str) -> str:
-    return text.replace("\r\n", "\n").replace("\r", "\n").strip()
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "lower_blob", f"{self.heading}\n{self.text}".lower())
 
 
-_HEADING_ARTICLE_RE = re.compile(
-    r"(?mi)^(?P<prefix>#{1,6}\s*)(?P<label>artikel)\s+(?P<num>(?:\d+(?:\.\d+)*|[IVXLCDM]+))\b(?P<rest>[^\n]*)$"
-)
+def _normalize_text(text: str) -> str:
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text.strip()
 
-_BOLD_ARTICLE_RE = re.compile(
-    r"(?mi)^(?P<prefix>\*\*)(?P<label>artikel)\s+(?P<num>(?:\d+(?:\.\d+)*|[IVXLCDM]+))\b(?P<rest>[^*\n]*)\*\*(?P<tail>.*)$"
-)
 
-_PLAIN_ARTICLE_RE = re.compile(
-    r"(?mi)^(?P<label>artikel)\s+(?P<num>(?:\d+(?:\.\d+)*|[IVXLCDM]+))\b(?P<rest>[^\n]*)$"
+# Markdown heading (`## Artikel 1`), bold (`**Artikel 1** ...`) and plain (`Artikel 1`)
+# article headers, fused so a document is scanned once.
+_ARTICLE_RE = re.compile(
+    r"(?mi)^(?:(?P<heading>#{1,6}\s*)|(?P<bold>\*\*))?(?P<label>artikel)\s+(?P<num>(?:\d+(?:\.\d+)*|[IVXLCDM]+))\b"
+    r"(?(bold)(?P<rest>[^*\n]*)\*\*(?P<tail>.*)|[^\n]*)$"
 )
 
 
 def _find_article_headers(text: str) -> List[re.Match]:
-    matches = list(_HEADING_ARTICLE_RE.finditer(text))
-    if matches:
-        return matches
+    """
+    Return article headers of the most specific style present in the text:
+    Markdown headings, else bold headers, else plain `Artikel N` lines.
+    """
+    heading: List[re.Match] = []
+    bold: List[re.Match] = []
+    plain: List[re.Match] = []
+
+    for m in _ARTICLE_RE.finditer(text):
+        if m.group("heading") is not None:
+            heading.append(m)
+        elif m.group("bold") is not None:
+            bold.append(m)
+        else:
+            plain.append(m)
+
+    return heading or bold or plain
+
 
-    matches = list(_BOLD_ARTICLE_RE.finditer(text))
-    if matches:
-        return matches
+class ArtifactCache:
+    """
+    On-disk cache (diskcache) for parsed chunks and token counts, shared across runs.
 
-    return list(_PLAIN_ARTICLE_RE.finditer(text))
+    Keys are content hashes, so edited documents are re-parsed automatically.
+    """
+
+    # Bump when chunking changes so stale chunks are not reused.
+    VERSION = "1"
+
+    def __init__(self, directory: str | Path) -> None:
+        try:
+            import diskcache
+        except Exception as e:
+            raise ImportError(
+                "Missing diskcache dependency. Run: pip install -r requirements.txt"
+            ) from e
+
+        self._cache = diskcache.Cache(str(Path(directory).expanduser()))
+
+    @staticmethod
+    def key(*parts: Optional[str]) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            h.update((part or "").encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key: str) -> Any:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        self._cache.set(key, value)
 
 
 class MarkdownParser:
-    
+
+    def __init__(self, cache: Optional[ArtifactCache] = None) -> None:
+        self._cache = cache
+        # Parsed chunks per document id. Chunks are immutable, so documents shared
+        # across addresses are only segmented once.
+        self._chunk_cache: Dict[str, List[LegalChunk]] = {}
+
     def split_by_article(self, document: ZoningDocument) -> List[LegalChunk]:
+        chunks = self._chunk_cache.get(document.id)
+        if chunks is None:
+            chunks = self._load_or_split(document)
+            self._chunk_cache[document.id] = chunks
+        return list(chunks)
+
+    def _load_or_split(self, document: ZoningDocument) -> List[LegalChunk]:
+        if self._cache is None:
+            return self._split_by_article(document)
+
+        key = ArtifactCache.key(
+            "chunks",
+            ArtifactCache.VERSION,
+            document.id,
+            document.title,
+            document.document_type,
+            document.established_date,
+            document.text,
+        )
+        chunks = self._cache.get(key)
+        if chunks is None:
+            chunks = self._split_by_article(document)
+            self._cache.set(key, chunks)
+        return chunks
+
+    def _split_by_article(self, document: ZoningDocument) -> List[LegalChunk]:
         text = _normalize_text(document.text)
         matches = _find_article_headers(text)
 
@@ -73,12 +156,13 @@ class MarkdownParser:
 
         chunks: List[LegalChunk] = []
 
-        for i, m in enumerate(matches):
-            start = m.start()
-            end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        bounds = [m.start() for m in matches]
+        bounds.append(len(text))
+
+        for m, (start, end) in zip(matches, pairwise(bounds)):
             chunk_text = text[start:end].strip()
 
-            article_id = m.group("num").strip() if "num" in m.groupdict() else None
+            article_id = m.group("num").strip()
             heading_line = m.group(0).strip()
 
             chunks.append(
@@ -96,11 +180,64 @@ class MarkdownParser:
         return chunks
 
 
-def estimate_tokens(text: str, model: str = "gpt-4o") -> int:
+@functools.lru_cache(maxsize=4)
+def _get_encoder(model: str):
     try:
         import tiktoken
 
-        enc = tiktoken.encoding_for_model(model)
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        return None
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def estimate_tokens(text: str, model: str = "gpt-4o") -> int:
+    enc = _get_encoder(model)
+    if enc is None:
+        return _approx_tokens(text)
+    try:
         return len(enc.encode(text))
     except Exception:
-        return max(1, len(text) // 4)
+        return _approx_tokens(text)
+
+
+def estimate_tokens_batch(texts: Sequence[str], model: str = "gpt-4o", cache: Optional[ArtifactCache] = None) -> List[int]:
+    """
+    Token counts for many texts in one (multi-threaded) tiktoken call.
+
+    With a cache, counts are looked up per text and only the misses are encoded.
+    Only exact tiktoken counts are stored; chars/4 fallback estimates never are.
+    """
+    if cache is None:
+        counts, _ = _encode_lengths(texts, model)
+        return counts
+
+    keys = [ArtifactCache.key("tokens", model, t) for t in texts]
+    cached: List[Optional[int]] = [cache.get(k) for k in keys]
+
+    missing = [i for i, n in enumerate(cached) if n is None]
+    encoded: Dict[int, int] = {}
+    if missing:
+        counts, exact = _encode_lengths([texts[i] for i in missing], model)
+        encoded = dict(zip(missing, counts))
+        if exact:
+            for i, n in encoded.items():
+                cache.set(keys[i], n)
+
+    return [n if n is not None else encoded[i] for i, n in enumerate(cached)]
+
+
+def _encode_lengths(texts: Sequence[str], model: str) -> Tuple[List[int], bool]:
+    """
+    Token counts, and whether they are exact tiktoken counts rather than estimates.
+    """
+    enc = _get_encoder(model)
+    if enc is None:
+        return [_approx_tokens(t) for t in texts], False
+    try:
+        return [len(ids) for ids in enc.encode_batch(list(texts), num_threads=os.cpu_count() or 1)], True
+    except Exception:
+        return [estimate_tokens(t, model=model) for t in texts], False
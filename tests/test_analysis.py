@@ -0,0 +1,66 @@
+import pytest
+
+import parsing
+from analysis import ContextBuilder, ContextBuilderConfig, ResidentPlan
+from ingestion import ZoningPlanFile
+from parsing import estimate_tokens
+
+
+def _zoning_plan(documents):
+    return ZoningPlanFile.model_validate(
+        {
+            "address": {
+                "display_address": "Teststraat 1, 1234AB Teststad",
+                "postcode": "1234AB",
+                "municipality": "Teststad",
+                "province": "Utrecht",
+                "country": "NL",
+            },
+            "zoning_documents": documents,
+            "zoning_metadata": {"bestemmingsvlakken": ["Wonen"]},
+        }
+    )
+
+
+@pytest.mark.parametrize("budget", range(50, 140, 5))
+def test_context_stays_within_token_budget_when_headers_differ(monkeypatch, budget):
+    # Deterministic chars/4 token estimates, independent of tiktoken availability.
+    monkeypatch.setattr(parsing, "_get_encoder", lambda model: None)
+
+    body = (
+        "## Artikel 1 Bijbehorend bouwwerk\n"
+        "Een bijbehorend bouwwerk is vergunningsvrij, mits de bouwhoogte ten hoogste 3 m is."
+    )
+    documents = [
+        {
+            "id": "noord",
+            "title": "Plan Noord",
+            "text": body,
+            "document_type": "Omgevingsplan",
+            "established_date": None,
+        },
+        {
+            "id": "zuid",
+            "title": "Plan Zuid",
+            "text": body,
+            "document_type": "Bestemmingsplan",
+            "established_date": "2020-01-01T00:00:00+00:00",
+        },
+    ]
+    zoning_plan = _zoning_plan(documents)
+
+    builder = ContextBuilder(cfg=ContextBuilderConfig(max_context_tokens=budget, include_definitions=False))
+    context, selected = builder.build_context(
+        zoning_plan=zoning_plan,
+        documents=zoning_plan.zoning_documents,
+        plan=ResidentPlan(),
+    )
+
+    blocks = [f"{ContextBuilder._format_header(c)}{c.text}\n" for c in selected]
+    costs = [estimate_tokens(b) for b in blocks]
+    n_included = context.count("[SOURCE]")
+
+    assert len(selected) == 2
+    assert sum(costs[:n_included]) <= budget
+    # Greedy in selection order: the first block that does not fit ends the context.
+    assert n_included == len(selected) or sum(costs[: n_included + 1]) > budget